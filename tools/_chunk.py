@@ -0,0 +1,57 @@
+# Sentence-aware text chunking shared by the TTS renderers
+# - Collapses whitespace, splits after sentence punctuation
+# - Re-glues sentences into chunks under max_chars
+
+import functools
+import operator
+import re
+from typing import List
+
+SENTENCE_END = re.compile(r'([.!?…]+["\')\]]?\s+)', flags=re.MULTILINE)
+_WS_RE       = re.compile(r'\s+')
+
+def sentence_chunk(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into sentence-like chunks under max_chars.
+    We first split by sentence punctuation, then glue back respecting max_chars.
+    """
+    return list(_sentence_chunk_cached(text, max_chars))
+
+@functools.lru_cache(maxsize=256)
+def _sentence_chunk_cached(text: str, max_chars: int) -> tuple:
+    # Memoized on (text, max_chars); tuple so callers can't mutate the cached result
+    text = _WS_RE.sub(' ', text.strip())
+    if not text:
+        return ()
+
+    parts = _split_sentences(text)
+
+    # Re-glue under max_chars
+    chunks = []
+    cur = ""
+    for p in parts:
+        if len(cur) + len(p) <= max_chars:
+            cur += p
+        else:
+            if cur.strip():
+                chunks.append(cur.strip())
+            cur = p
+    if cur.strip():
+        chunks.append(cur.strip())
+    return tuple(chunks)
+
+def _split_sentences(text: str) -> List[str]:
+    """
+    Split whitespace-normalized text after each sentence end. SENTENCE_END.split()
+    does the whole scan in C and, thanks to the capturing group, hands back
+    [seg, end, seg, end, …, tail], so no per-match Python loop is needed.
+    """
+    pieces = SENTENCE_END.split(text + " ")  # extra space to catch last segment
+    tail = pieces.pop()
+    parts = list(map(operator.add, pieces[0::2], pieces[1::2]))
+    # The extra space belongs to the tail, or to the last sentence end if the text ends one
+    if tail:
+        parts.append(tail[:-1])
+    else:
+        parts[-1] = parts[-1][:-1]
+    return parts
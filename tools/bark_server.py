@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# Long-lived Bark worker for render_bark.py
+# - Loads Bark models once, then serves jobs until killed (Ctrl+C)
+# - Jobs arrive over multiprocessing.connection: (text, voice_id, out_path)
+# - Unix domain socket on Linux/macOS, named pipe on Windows
+# - Socket and authkey live in a private per-user directory (0700, key file 0600)
+# - Replies ("ok", out_path) or ("error", message) per job
+# - A misbehaving or interrupted client is logged and dropped; the server keeps running
+# - One client at a time: a second render_bark.py waits until the first disconnects
+
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+SAMPLE_RATE   = 24000  # Bark outputs 24kHz
+PROBE_TIMEOUT = 5.0    # seconds; a live server busy with another client can't answer sooner
+
+def runtime_dir() -> str:
+    """
+    Per-user directory for the socket and authkey, created 0700 and refused
+    if another user owns it or could write to it (e.g. pre-created in /tmp).
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "bark_server")
+        os.makedirs(path, exist_ok=True)  # inside the user profile, already ACL-protected
+        return path
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    path = os.path.join(base, "bark_server") if base else \
+        os.path.join(tempfile.gettempdir(), f"bark_server-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise SystemExit(f"Refusing to use {path}: must be a directory owned by you with mode 0700")
+    return path
+
+RUNTIME_DIR = runtime_dir()
+if sys.platform == "win32":
+    FAMILY  = "AF_PIPE"
+    ADDRESS = rf"\\.\pipe\bark_server-{os.environ.get('USERNAME', 'user')}"
+else:
+    FAMILY  = "AF_UNIX"
+    ADDRESS = os.path.join(RUNTIME_DIR, "bark.sock")
+AUTHKEY_PATH = os.path.join(RUNTIME_DIR, "authkey")
+
+def load_authkey(create: bool = False) -> bytes:
+    """
+    Random per-user authkey shared by server and clients through a 0600 file.
+    multiprocessing.connection unpickles whatever it receives, so this key is
+    what keeps other local users from talking to (or impersonating) the server.
+    """
+    if create:
+        try:
+            fd = os.open(AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    with open(AUTHKEY_PATH, encoding="ascii") as f:
+        return f.read().strip().encode("ascii")
+
+def server_running(authkey: bytes) -> bool:
+    """
+    True if another bark_server already answers on ADDRESS. The handshake only
+    completes once the server accept()s, so a server busy with another client
+    is detected by the probe still waiting after PROBE_TIMEOUT.
+    """
+    answered = []
+
+    def probe():
+        try:
+            Client(ADDRESS, family=FAMILY, authkey=authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            return
+        answered.append(True)
+
+    t = threading.Thread(target=probe, daemon=True)
+    t.start()
+    t.join(PROBE_TIMEOUT)
+    return t.is_alive() or bool(answered)
+
+def serve_client(conn, generate_audio, sf) -> None:
+    """Handle jobs from one client until it disconnects."""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return  # client finished
+        except OSError:
+            raise  # connection lost; main() drops this client
+        except Exception as e:
+            # The whole message was read, only unpickling failed, so the stream is still in sync
+            print(f"[error] bad job: {e!r}")
+            conn.send(("error", f"could not decode job: {e!r}"))
+            continue
+        try:
+            text, voice_id, out_path = job
+        except (TypeError, ValueError):
+            print(f"[error] bad job: {type(job).__name__}")
+            conn.send(("error", "expected a (text, voice_id, out_path) tuple"))
+            continue
+        print(f"[render] {out_path} voice={voice_id}")
+        try:
+            audio = generate_audio(text, history_prompt=voice_id)
+            sf.write(out_path, audio, SAMPLE_RATE)
+        except Exception as e:
+            print(f"[error] {out_path}: {e}")
+            conn.send(("error", str(e)))
+            continue
+        conn.send(("ok", out_path))
+
+def main():
+    authkey = load_authkey(create=True)
+    if server_running(authkey):
+        raise SystemExit(f"A Bark server is already listening on {ADDRESS}")
+
+    # Heavy imports live here so render_bark.py can import the address constants cheaply
+    import soundfile as sf
+    from bark import generate_audio, preload_models
+
+    print("[init] Preloading Bark models…")
+    preload_models()
+
+    if FAMILY == "AF_UNIX" and os.path.exists(ADDRESS):
+        os.unlink(ADDRESS)  # stale socket from a previous run (nobody answered above)
+
+    with Listener(ADDRESS, family=FAMILY, authkey=authkey) as listener:
+        print(f"[ready] listening on {ADDRESS}")
+        while True:
+            try:
+                with listener.accept() as conn:
+                    serve_client(conn, generate_audio, sf)
+            except (OSError, EOFError, AuthenticationError) as e:
+                # Wrong authkey or a client that went away mid-job: drop it, keep the models loaded
+                print(f"[warn] client dropped: {e!r}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
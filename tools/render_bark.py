@@ -1,11 +1,10 @@
 import os, json
 from pathlib import Path
-import numpy as np
-import soundfile as sf
-from bark import generate_audio, preload_models
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
 
-# Preload models once (saves time)
-preload_models()
+# Address and per-user authkey shared with the long-lived worker (start it once: python tools/bark_server.py)
+from bark_server import ADDRESS, FAMILY, load_authkey
 
 # Load mapping
 voice_map = json.load(open("voices_map.json"))
@@ -14,25 +13,34 @@ VOICES_DIR = Path("voices")
 AUDIO_RAW = Path("audio_raw")
 AUDIO_RAW.mkdir(exist_ok=True)
 
+# Connect to the Bark server (models already loaded there)
+try:
+    conn = Client(ADDRESS, family=FAMILY, authkey=load_authkey())
+except (FileNotFoundError, ConnectionRefusedError):
+    raise SystemExit(f"Bark server not reachable at {ADDRESS}; start it with: python tools/bark_server.py")
+except AuthenticationError:
+    raise SystemExit(f"Authkey rejected at {ADDRESS}; is that socket someone else's bark_server?")
+
 # Iterate speakers
-for speaker_dir in VOICES_DIR.iterdir():
-    if not speaker_dir.is_dir():
-        continue
-    speaker_name = speaker_dir.name.replace("_", " ")
-    voice_id = voice_map.get(speaker_name, "v2/en_speaker_0")
-
-    for txt_file in speaker_dir.glob("*.txt"):
-        chapter = txt_file.stem  # e.g., 01_chapter1
-        out_file = AUDIO_RAW / f"{chapter}_{speaker_dir.name}.wav"
-
-        text = txt_file.read_text(encoding="utf-8").strip()
-        if not text:
+with conn:
+    for speaker_dir in VOICES_DIR.iterdir():
+        if not speaker_dir.is_dir():
             continue
+        speaker_name = speaker_dir.name.replace("_", " ")
+        voice_id = voice_map.get(speaker_name, "v2/en_speaker_0")
+
+        for txt_file in speaker_dir.glob("*.txt"):
+            chapter = txt_file.stem  # e.g., 01_chapter1
+            out_file = AUDIO_RAW / f"{chapter}_{speaker_dir.name}.wav"
 
-        print(f"Rendering {out_file} with voice {voice_id}…")
+            text = txt_file.read_text(encoding="utf-8").strip()
+            if not text:
+                continue
 
-        # Generate audio with Bark
-        audio_array = generate_audio(text, history_prompt=voice_id)
+            print(f"Rendering {out_file} with voice {voice_id}…")
 
-        # Save to WAV
-        sf.write(out_file, audio_array, 24000)  # Bark outputs 24kHz
+            # Server generates with Bark and writes the 24kHz WAV
+            conn.send((text, voice_id, str(out_file.resolve())))
+            status, detail = conn.recv()
+            if status != "ok":
+                print(f"Failed {out_file}: {detail}")
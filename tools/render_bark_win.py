@@ -3,25 +3,45 @@
 # - Reads voices/<Speaker>/*.txt
 # - Uses voices_map.json to map Speaker -> Bark voice preset
 # - Chunks long text for Bark stability, concatenates to a single WAV
-# - Saves to audio_raw/<chapter>_<speaker>.wav
+# - Saves to audio_raw/<chapter>_<speaker>.wav (on a background thread, so the next chapter starts right away)
 # - Resumes by default (skip existing) unless --overwrite
+# - Optional --workers N: persistent Bark worker pool, chunks spread across visible GPUs
+# - Optional --precision fp16|int8: halve (pre-Ampere GPU) or quarter (CPU) transformer weight bytes
+# - Optional --compile: torch.compile the Bark transformers (warmed up once per process)
+# - Optional --pipeline: text->semantic of the next chunk overlaps waveform decode of the current one
+# - Multi-GPU: `accelerate launch tools/render_bark_win.py …` shards chapters, one process per GPU
 
 import argparse
 import json
-import re
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 
 import numpy as np
 import soundfile as sf
 
 import torch
+import torch.multiprocessing as mp
 from torch.serialization import add_safe_globals
 add_safe_globals([np.core.multiarray.scalar])  # allow legacy numpy scalar in checkpoints
 
 
+try:
+    from accelerate import PartialState  # optional: only needed for `accelerate launch` sharding
+except ImportError:
+    PartialState = None
+
+# Shared sentence chunker (tools/_chunk.py)
+from _chunk import sentence_chunk
+
 # Bark
-from bark import generate_audio, preload_models
+from bark import preload_models
+from bark.api import semantic_to_waveform
+from bark.generation import generate_text_semantic
 
 # ---------- Config defaults ----------
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -31,7 +51,6 @@ VOICE_MAP    = PROJECT_ROOT / "voices_map.json"
 
 SAMPLE_RATE  = 24000          # Bark output SR
 MAX_CHARS    = 550            # conservative per-chunk size (Bark is happier under ~700)
-SENTENCE_END = re.compile(r'([.!?…]+["\')\]]?\s+)', flags=re.MULTILINE)
 
 # ------------------------------------
 
@@ -40,50 +59,190 @@ def load_voice_map() -> dict:
         raise FileNotFoundError(f"voices_map.json not found at: {VOICE_MAP}")
     return json.loads(VOICE_MAP.read_text(encoding="utf-8"))
 
-def sentence_chunk(text: str, max_chars: int) -> List[str]:
-    """
-    Split text into sentence-like chunks under max_chars.
-    We first split by sentence punctuation, then glue back respecting max_chars.
-    """
-    text = re.sub(r'\s+', ' ', text.strip())
-    if not text:
-        return []
-
-    parts = []
-    start = 0
-    for m in SENTENCE_END.finditer(text + " "):  # extra space to catch last segment
-        end = m.end()
-        parts.append(text[start:end])
-        start = end
-    if start < len(text):
-        parts.append(text[start:])
-
-    # Re-glue under max_chars
-    chunks = []
-    cur = ""
-    for p in parts:
-        if len(cur) + len(p) <= max_chars:
-            cur += p
-        else:
-            if cur.strip():
-                chunks.append(cur.strip())
-            cur = p
-    if cur.strip():
-        chunks.append(cur.strip())
-    return chunks
+def render_semantic(text: str, history_prompt: str) -> np.ndarray:
+    """
+    Text -> semantic tokens (the cheap "prefill" stage). Same call as
+    generate_audio()'s text_to_semantic step; the two stages are split only so
+    they can be pipelined (--pipeline) or compiled separately.
+    """
+    return generate_text_semantic(text, history_prompt=history_prompt, use_kv_caching=True)
 
-def render_text_to_audio(text: str, history_prompt: str) -> np.ndarray:
+def render_waveform(semantic: np.ndarray, history_prompt: str) -> np.ndarray:
     """
-    Generate a single audio array with Bark, catching occasional hiccups.
+    Semantic tokens -> coarse -> fine -> audio (the dominant "decode" stage),
+    i.e. the rest of generate_audio().
     """
-    audio = generate_audio(text, history_prompt=history_prompt)
+    audio = semantic_to_waveform(semantic, history_prompt=history_prompt)
     # Ensure float32 for saving
     if audio.dtype != np.float32:
         audio = audio.astype(np.float32)
     return audio
 
+def render_text_to_audio(text: str, history_prompt: str) -> np.ndarray:
+    """
+    Generate a single audio array with Bark, catching occasional hiccups.
+    """
+    return render_waveform(render_semantic(text, history_prompt), history_prompt)
+
+def apply_precision(precision: str) -> None:
+    """
+    Convert Bark's text/coarse/fine transformers in place. Decode is bound by
+    weight memory traffic, so fewer bytes per weight means faster tokens:
+    fp16 on CUDA, or int8 dynamic (weight-only Linear) quantization on CPU.
+    The EnCodec decoder stays fp32.
+
+    fp16 is skipped on bf16-capable GPUs (Ampere and newer): Bark already
+    wraps every generate call in bf16 autocast there, which would re-cast
+    fp16 weights on each call. int8 uses torch.ao.quantization.quantize_dynamic,
+    which torch marks deprecated in favour of torchao.
+    """
+    if precision == "fp32":
+        return
+    from bark.generation import models  # populated by preload_models()
+
+    if precision == "fp16":
+        if not torch.cuda.is_available():
+            print("[warn] --precision fp16 needs CUDA; keeping fp32")
+            return
+        if torch.cuda.is_bf16_supported():
+            # Same test bark.generation uses to turn on autocast(dtype=torch.bfloat16)
+            print("[warn] --precision fp16 skipped: Bark already autocasts to bf16 on this GPU; keeping fp32")
+            return
+        convert = lambda m: m.half().cuda()
+    else:  # int8
+        if torch.cuda.is_available():
+            # quantize_dynamic kernels are CPU-only; moving the GPTs off the GPU would be far slower
+            print("[warn] --precision int8 is CPU-only; keeping fp32")
+            return
+        convert = lambda m: torch.ao.quantization.quantize_dynamic(m, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if "text" in models:
+        models["text"]["model"] = convert(models["text"]["model"])
+    for key in ("coarse", "fine"):
+        if key in models:
+            models[key] = convert(models[key])
+
+def compile_models() -> None:
+    """
+    Wrap Bark's text/coarse/fine transformers in torch.compile, then run one
+    short render so the compiled graphs are cached before the real chunks.
+    Default mode with dynamic shapes: the KV cache grows every decode step,
+    and CUDA graphs ("reduce-overhead") would record a new graph per length.
+    """
+    from bark.generation import models  # populated by preload_models()
+    opts = dict(dynamic=True, fullgraph=False)
+    if "text" in models:
+        models["text"]["model"] = torch.compile(models["text"]["model"], **opts)
+    for key in ("coarse", "fine"):
+        if key in models:
+            models[key] = torch.compile(models[key], **opts)
+    render_text_to_audio("Warming up.", history_prompt="v2/en_speaker_0")
+
+def preload(small_models: bool, precision: str = "fp32", compile_graphs: bool = False) -> None:
+    """Load Bark weights (optionally the small variants) into this process."""
+    preload_models(text_use_small=small_models, coarse_use_small=small_models,
+                   fine_use_small=small_models)
+    apply_precision(precision)  # before compiling, so graphs are traced at the final dtype
+    if compile_graphs:
+        compile_models()
+
+def _init_worker(device_queue, small_models: bool, precision: str, compile_graphs: bool) -> None:
+    """
+    Pool initializer: pin this worker to one GPU and load Bark once, so the
+    model load is paid per worker rather than per chunk.
+    """
+    device = device_queue.get()
+    if device is not None:
+        # Too late for CUDA_VISIBLE_DEVICES: the spawn re-import of this script already
+        # ran `import bark`, which initializes CUDA. Setting the current device still
+        # works, and Bark's "cuda" resolves to it (same as under accelerate launch).
+        torch.cuda.set_device(device)
+    preload(small_models, precision, compile_graphs)
+
+def _render_chunk(text: str, history_prompt: str):
+    """Pool task: returns (audio, None) or (None, error message) so one bad chunk can't abort the map."""
+    try:
+        return render_text_to_audio(text, history_prompt), None
+    except Exception as e:
+        return None, str(e)
+
+def pipelined_chunks(chunks: List[str], history_prompt: str):
+    """
+    In-process render where a producer thread runs chunk i+1's text->semantic
+    on its own CUDA stream while chunk i decodes on another. Semantic tokens
+    come back as host arrays, so no cross-stream event is needed between stages.
+    Yields (audio, err) per chunk, in order, like _render_chunk.
+    """
+    use_cuda = torch.cuda.is_available()
+    prefill_stream = torch.cuda.Stream() if use_cuda else None
+    decode_stream = torch.cuda.Stream() if use_cuda else None
+    semantic_q = queue.Queue(maxsize=1)  # one chunk of lookahead is enough to hide prefill
+
+    def on_stream(stream):
+        return torch.cuda.stream(stream) if stream is not None else nullcontext()
+
+    def producer():
+        for ck in chunks:
+            try:
+                with on_stream(prefill_stream):
+                    semantic_q.put((render_semantic(ck, history_prompt), None))
+            except Exception as e:
+                semantic_q.put((None, str(e)))
+
+    worker = threading.Thread(target=producer, daemon=True)
+    worker.start()
+    for _ in chunks:
+        semantic, err = semantic_q.get()
+        if err is not None:
+            yield None, err
+            continue
+        try:
+            with on_stream(decode_stream):
+                audio = render_waveform(semantic, history_prompt)
+        except Exception as e:
+            yield None, str(e)
+            continue
+        yield audio, None
+    worker.join()
+
+def make_pool(workers: int, small_models: bool, precision: str, compile_graphs: bool):
+    """
+    Start `workers` persistent Bark processes, assigned round-robin to the
+    visible CUDA devices (several workers per device share it via separate contexts).
+    """
+    ngpu = torch.cuda.device_count()
+    ctx = mp.get_context("spawn")  # CUDA can't be used from forked children
+    device_queue = ctx.Queue()
+    for i in range(workers):
+        device_queue.put(i % ngpu if ngpu else None)
+    return ctx.Pool(processes=workers, initializer=_init_worker, initargs=(device_queue, small_models, precision, compile_graphs))
+
+def to_pcm16(full: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    float32 [-1, 1] -> int16 PCM, attenuating only if the peak would clip.
+    Returns (pcm, applied gain).
+    """
+    peak = max(1e-9, float(np.max(np.abs(full))))
+    scale = min(1.0, 0.99 / peak)
+    pcm = np.clip(full * (scale * 32767.0), -32768, 32767).astype(np.int16)
+    return pcm, scale
+
+def write_wav(out_path: Path, full: np.ndarray) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    # 16-bit PCM: half the bytes of float32 WAV, and what players/FFmpeg expect anyway
+    pcm, gain = to_pcm16(full)
+    if gain < 1.0:
+        print(f"[gain]  {out_path.name}: peak limited, gain {gain:.4f}")
+    sf.write(out_path, pcm, SAMPLE_RATE, subtype="PCM_16")
+    print(f"[done]  {out_path}")
+
 def render_file(txt_path: Path, speaker_display: str, voice_id: str, out_path: Path,
-                overwrite: bool, max_chars: int) -> None:
+                overwrite: bool, max_chars: int, pool=None,
+                pipeline: bool = False) -> Optional[Tuple[Path, np.ndarray]]:
+    """
+    Render one .txt to audio. Returns (out_path, samples) for the caller to
+    write, or None if the file was skipped or nothing rendered.
+    """
     if out_path.exists() and not overwrite:
         print(f"[skip] {out_path.name} (exists)")
         return
@@ -100,27 +259,39 @@ def render_file(txt_path: Path, speaker_display: str, voice_id: str, out_path: P
 
     print(f"[render] {out_path.name} — speaker={speaker_display} voice={voice_id} chunks={len(chunks)}")
 
-    # Generate and concatenate with a small silence pad between chunks
-    silence = np.zeros(int(0.20 * SAMPLE_RATE), dtype=np.float32)  # 200ms pad
-    rendered = []
-    for i, ck in enumerate(chunks, 1):
-        try:
-            audio = render_text_to_audio(ck, history_prompt=voice_id)
-        except Exception as e:
-            print(f"[error] chunk {i}/{len(chunks)} failed: {e}")
+    # Generate, then copy into one preallocated buffer with a small silence pad between chunks
+    pad_len = int(0.20 * SAMPLE_RATE)  # 200ms pad
+    if pool is not None:
+        results = pool.starmap(_render_chunk, [(ck, voice_id) for ck in chunks])
+    elif pipeline:
+        results = pipelined_chunks(chunks, voice_id)
+    else:
+        results = (_render_chunk(ck, voice_id) for ck in chunks)
+
+    audios, offsets = [], []
+    total_len = 0
+    for i, (audio, err) in enumerate(results, 1):
+        if err is not None:
+            print(f"[error] chunk {i}/{len(chunks)} failed: {err}")
             continue
-        rendered.append(audio)
+        audios.append(audio)
+        offsets.append(total_len)
+        total_len += len(audio)
         if i < len(chunks):
-            rendered.append(silence)
+            total_len += pad_len
 
-    if not rendered:
+    if not audios:
         print(f"[error] Nothing rendered for {txt_path}")
         return
 
-    full = np.concatenate(rendered)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    sf.write(out_path, full, SAMPLE_RATE)
-    print(f"[done]  {out_path}")
+    # Zeroed buffer: the gaps between slices are the pads, no per-pad arrays or final concatenate
+    full = np.zeros(total_len, dtype=np.float32)
+    for j, off in enumerate(offsets):
+        a = audios[j]
+        full[off:off + len(a)] = a
+        audios[j] = None  # drop each chunk once copied
+
+    return out_path, full
 
 def main():
     parser = argparse.ArgumentParser(description="Render Bark TTS for My_Audiobook_Project")
@@ -130,15 +301,44 @@ def main():
                         help="Restrict to one or more chapter stems (e.g., 01_chapter1 05_chapter5)")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing WAV files")
     parser.add_argument("--max-chars", type=int, default=MAX_CHARS, help="Max characters per chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Bark worker processes (spread across visible GPUs); 1 renders in-process")
+    parser.add_argument("--small-models", action="store_true", help="Use Bark's small text/coarse/fine models")
+    parser.add_argument("--precision", choices=("fp32", "fp16", "int8"), default="fp32",
+                        help="Transformer weight precision: fp16 needs a CUDA GPU without bf16 "
+                             "(Ampere+ already runs Bark under bf16 autocast), int8 only applies to "
+                             "CPU-only runs and uses torch's deprecated quantize_dynamic "
+                             "(both fall back to fp32 otherwise)")
+    parser.add_argument("--compile", action="store_true",
+                        help="torch.compile the Bark transformers (slow first chunk, faster after)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap next chunk's text stage with current chunk's decode (in-process only)")
     args = parser.parse_args()
 
     if not VOICES_DIR.exists():
         raise FileNotFoundError(f"voices directory not found: {VOICES_DIR}")
     AUDIO_RAW.mkdir(exist_ok=True)
 
-    # Preload Bark once (faster subsequent renders)
-    print("[init] Preloading Bark models…")
-    preload_models()
+    # Under `accelerate launch`, each process owns one GPU (PartialState sets the
+    # current CUDA device, which Bark's "cuda" then resolves to) and a slice of the jobs
+    state = PartialState() if PartialState is not None else None
+    sharded = state is not None and state.num_processes > 1
+    tag = f"[rank {state.process_index}/{state.num_processes}] " if sharded else ""
+    if sharded and args.workers > 1:
+        print(f"{tag}[warn] --workers is ignored when sharding across processes")
+        args.workers = 1
+    if args.pipeline and args.workers > 1:
+        print("[warn] --pipeline is ignored with --workers > 1 (pool workers render whole chunks)")
+        args.pipeline = False
+
+    # Preload Bark once (faster subsequent renders), either here or in each pool worker
+    pool = None
+    if args.workers > 1:
+        print(f"[init] Starting {args.workers} Bark workers…")
+        pool = make_pool(args.workers, args.small_models, args.precision, args.compile)
+    else:
+        print(f"{tag}[init] Preloading Bark models…")
+        preload(args.small_models, args.precision, args.compile)
 
     voice_map = load_voice_map()
 
@@ -146,8 +346,13 @@ def main():
     speakers_filter = set(args.speaker) if args.speaker else None
     chapters_filter = set(args.chapter) if args.chapter else None
 
-    total = 0
-    for speaker_dir in sorted([p for p in VOICES_DIR.iterdir() if p.is_dir()], key=lambda p: p.name.lower()):
+    # Build the full (txt, speaker, voice, out) job list; every process sees the same order
+    jobs = []
+    # scandir's DirEntry answers is_dir()/is_file() from the directory read, no per-entry stat
+    with os.scandir(VOICES_DIR) as it:
+        speaker_dirs = sorted((Path(e.path) for e in it if e.is_dir()), key=lambda p: p.name.lower())
+
+    for speaker_dir in speaker_dirs:
         if speakers_filter and speaker_dir.name not in speakers_filter:
             continue
 
@@ -155,16 +360,42 @@ def main():
         speaker_display = speaker_dir.name.replace("_", " ")
         voice_id = voice_map.get(speaker_display, "v2/en_speaker_0")
 
-        for txt_file in sorted(speaker_dir.glob("*.txt"), key=lambda p: p.name.lower()):
+        with os.scandir(speaker_dir) as it:
+            txt_files = sorted((Path(e.path) for e in it if e.is_file() and e.name.endswith(".txt")),
+                               key=lambda p: p.name.lower())
+
+        for txt_file in txt_files:
             chapter_stem = txt_file.stem          # e.g., 05_chapter5
             if chapters_filter and chapter_stem not in chapters_filter:
                 continue
 
             out_file = AUDIO_RAW / f"{chapter_stem}_{speaker_dir.name}.wav"
-            render_file(txt_file, speaker_display, voice_id, out_file, args.overwrite, args.max_chars)
+            jobs.append((txt_file, speaker_display, voice_id, out_file))
+
+    # WAV encoding + disk writes run here while the GPU moves on to the next chapter
+    io_pool = ThreadPoolExecutor(max_workers=2)
+    futures = []
+
+    total = 0
+    with (state.split_between_processes(jobs) if sharded else nullcontext(jobs)) as local_jobs:
+        for txt_file, speaker_display, voice_id, out_file in local_jobs:
+            job = render_file(txt_file, speaker_display, voice_id, out_file, args.overwrite, args.max_chars, pool,
+                              args.pipeline)
+            if job is not None:
+                futures.append(io_pool.submit(write_wav, *job))
             total += 1
 
-    print(f"[summary] processed files: {total}")
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    wait(futures)
+    io_pool.shutdown()
+    for fut in futures:
+        if fut.exception() is not None:
+            print(f"[error] write failed: {fut.exception()}")
+
+    print(f"{tag}[summary] processed files: {total}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,22 @@
-import os, json
+import os, json, time, asyncio, random, argparse, struct, wave
 from pathlib import Path
-import soundfile as sf
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 
-client = OpenAI()
+# Shared sentence chunker (tools/_chunk.py)
+from _chunk import sentence_chunk
+
+# SDK-level retries would bypass the token bucket; render_one owns all retrying
+client = AsyncOpenAI(max_retries=0)
+
+# Transient failures the SDK would have retried itself (APITimeoutError subclasses APIConnectionError)
+RETRYABLE = (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)
+
+MODEL           = "gpt-4o-mini-tts"
+MAX_CONCURRENCY = 16     # in-flight speech requests (I/O-bound, so well above CPU count)
+MAX_RETRIES     = 6      # attempts per chunk (.partNNN.wav) on 429/5xx/network errors before giving up
+DEFAULT_RPM     = 500    # gpt-4o-mini-tts tier-1 requests/min; raise to match your plan
+DEFAULT_TPM     = 50000  # input chars/min (len(text) is the token estimate)
+MAX_CHARS       = 1500   # per-request chunk; keeps each call well under the input limit
 
 # Load voice map
 voice_map = json.load(open("voices_map.json"))
@@ -12,32 +25,199 @@ VOICES_DIR = Path("voices")
 AUDIO_RAW = Path("audio_raw")
 AUDIO_RAW.mkdir(exist_ok=True)
 
-# Iterate speakers
-for speaker_dir in VOICES_DIR.iterdir():
-    if not speaker_dir.is_dir():
-        continue
-    speaker_name = speaker_dir.name.replace("_", " ")
-    voice_id = voice_map.get(speaker_name, "alloy")
-
-    for txt_file in speaker_dir.glob("*.txt"):
-        chapter = txt_file.stem  # e.g., 01_chapter1
-        out_file = AUDIO_RAW / f"{chapter}_{speaker_dir.name}.wav"
-
-        # Read lines
-        lines = txt_file.read_text(encoding="utf-8").splitlines()
-        text = " ".join(lines).strip()
-        if not text:
+class TokenBucket:
+    """
+    Proactive requests/min + chars/min limiter, after the OpenAI cookbook
+    api_request_parallel_processor: capacity refills continuously and a call
+    is only issued once both buckets can cover it, so we don't burst into 429s.
+    """
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.available_request_capacity = rpm
+        self.available_token_capacity = tpm
+        self.last_update = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.available_request_capacity = min(self.rpm, self.available_request_capacity + elapsed * self.rpm / 60)
+        self.available_token_capacity = min(self.tpm, self.available_token_capacity + elapsed * self.tpm / 60)
+        self.last_update = now
+
+    async def acquire(self, tokens: int):
+        tokens = min(tokens, self.tpm)  # an oversized input must still go out eventually
+        while True:
+            self._refill()
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return
+            # Sleep just long enough for the scarcer bucket to refill
+            need_req = max(0.0, 1 - self.available_request_capacity) * 60 / self.rpm
+            need_tok = max(0.0, tokens - self.available_token_capacity) * 60 / self.tpm
+            await asyncio.sleep(max(need_req, need_tok, 0.001))
+
+    def observe(self, headers):
+        """Clamp local capacity to the server's x-ratelimit-remaining-* view when present."""
+        if headers is None:
+            return
+        for header, attr in (("x-ratelimit-remaining-requests", "available_request_capacity"),
+                             ("x-ratelimit-remaining-tokens", "available_token_capacity")):
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                remaining = float(value)
+            except ValueError:
+                continue
+            self._refill()
+            setattr(self, attr, min(getattr(self, attr), remaining))
+
+def collect_jobs(max_chars):
+    """Build the (out_file, chunks, voice_id) job list up front."""
+    jobs = []
+    for speaker_dir in VOICES_DIR.iterdir():
+        if not speaker_dir.is_dir():
             continue
+        speaker_name = speaker_dir.name.replace("_", " ")
+        voice_id = voice_map.get(speaker_name, "alloy")
+
+        for txt_file in speaker_dir.glob("*.txt"):
+            chapter = txt_file.stem  # e.g., 01_chapter1
+            out_file = AUDIO_RAW / f"{chapter}_{speaker_dir.name}.wav"
+
+            # Read lines
+            lines = txt_file.read_text(encoding="utf-8").splitlines()
+            text = " ".join(lines).strip()
+            if not text:
+                continue
+            jobs.append((out_file, sentence_chunk(text, max_chars), voice_id))
+    return jobs
+
+def part_path(out_file, i):
+    return out_file.with_name(f"{out_file.stem}.part{i:03d}.wav")
+
+def read_wav_pcm(path):
+    """
+    Return ((channels, sampwidth, framerate), pcm_bytes) from a WAV file.
+    Streamed WAVs may carry placeholder RIFF/data sizes, so the data chunk
+    is taken to run to end of file when its size doesn't fit.
+    """
+    data = path.read_bytes()
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError(f"{path.name}: not a RIFF/WAVE file")
+    params = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            channels, framerate = struct.unpack_from("<HI", data, body + 2)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            params = (channels, bits // 8, framerate)
+        elif chunk_id == b"data":
+            if params is None:
+                raise ValueError(f"{path.name}: data chunk before fmt chunk")
+            end = body + size if body + size <= len(data) else len(data)
+            return params, data[body:end]
+        pos = body + size + (size & 1)
+    raise ValueError(f"{path.name}: no data chunk")
+
+def merge_wavs(parts, out_file):
+    """Concatenate the PCM payloads of the part WAVs under one header, then delete the parts."""
+    with wave.open(str(out_file), "wb") as out:
+        first = None
+        for part in parts:
+            params, pcm = read_wav_pcm(part)
+            if first is None:
+                first = params
+                out.setnchannels(params[0])
+                out.setsampwidth(params[1])
+                out.setframerate(params[2])
+            elif params != first:
+                raise ValueError(f"{part.name}: format {params} differs from {first}")
+            out.writeframes(pcm)
+    for part in parts:
+        part.unlink()
+
+async def render_one(sem, limiter, out_file, text, voice_id):
+    """Render one chunk; the dispatcher has already taken a semaphore slot and bucket capacity."""
+    try:
+        # Exponential backoff with jitter on 429s and transient errors; retries go back through the bucket
+        for attempt in range(MAX_RETRIES):
+            if attempt:
+                await limiter.acquire(len(text))
+            try:
+                # Stream straight to disk so memory per request stays O(chunk), not O(wav)
+                async with client.audio.speech.with_streaming_response.create(
+                    model=MODEL,
+                    voice=voice_id,
+                    input=text,
+                    response_format="wav"
+                ) as resp:
+                    limiter.observe(resp.headers)
+                    await resp.stream_to_file(out_file)
+                break
+            except RETRYABLE as e:
+                # Connection errors carry no response, so no headers to observe
+                limiter.observe(getattr(getattr(e, "response", None), "headers", None))
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                delay = 2 ** attempt + random.random()
+                reason = "Rate limited" if isinstance(e, RateLimitError) else type(e).__name__
+                print(f"{reason} on {out_file.name}, retrying in {delay:.1f}s…")
+                await asyncio.sleep(delay)
+    finally:
+        sem.release()
+
+async def finish_file(out_file, parts, chunk_tasks):
+    """Wait for one file's chunks, then stitch them into out_file off the event loop."""
+    results = await asyncio.gather(*chunk_tasks, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        for part in parts:
+            part.unlink(missing_ok=True)
+        raise errors[0]
+    await asyncio.to_thread(merge_wavs, parts, out_file)
+
+async def main(args):
+    jobs = collect_jobs(args.max_chars)
+    sem = asyncio.Semaphore(args.concurrency)
+    limiter = TokenBucket(args.rpm, args.tpm)
+
+    # Pending chunks wait here until a slot and both buckets have capacity
+    queue = asyncio.Queue()
+    for out_file, chunks, voice_id in jobs:
+        for i, text in enumerate(chunks):
+            queue.put_nowait((out_file, i, len(chunks), text, voice_id))
 
-        print(f"Rendering {out_file} with voice {voice_id}…")
+    finishers = []
+    chunk_tasks = []
+    while not queue.empty():
+        out_file, i, n, text, voice_id = queue.get_nowait()
+        if i == 0:
+            print(f"Rendering {out_file} with voice {voice_id} ({n} chunks)…")
+        await sem.acquire()
+        await limiter.acquire(len(text))
+        chunk_tasks.append(asyncio.create_task(render_one(sem, limiter, part_path(out_file, i), text, voice_id)))
+        if i == n - 1:
+            # Last chunk of this file is in flight; merge as soon as all of its chunks land
+            parts = [part_path(out_file, k) for k in range(n)]
+            finishers.append(asyncio.create_task(finish_file(out_file, parts, chunk_tasks)))
+            chunk_tasks = []
+    results = await asyncio.gather(*finishers, return_exceptions=True)
 
-        response = client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice=voice_id,
-            input=text,
-            format="wav"
-        )
+    failed = [(job, r) for job, r in zip(jobs, results) if isinstance(r, Exception)]
+    for (out_file, _chunks, _voice), err in failed:
+        print(f"Failed {out_file}: {err}")
+    print(f"Rendered {len(jobs) - len(failed)}/{len(jobs)} files")
 
-        # Save
-        with open(out_file, "wb") as f:
-            f.write(response.read())
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render OpenAI TTS for voices/<Speaker>/*.txt")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="Requests per minute budget")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="Input characters per minute budget")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Max in-flight requests")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS, help="Max characters per request chunk")
+    asyncio.run(main(parser.parse_args()))
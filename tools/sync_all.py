@@ -20,7 +20,14 @@ Run from project root:
   python3 tools/sync_all.py
 """
 from pathlib import Path
-import json, re, sys, html
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import json, os, re, sys, html, string
+
+try:
+    import orjson  # optional: faster JSON parse/serialize; stdlib json is the fallback
+except ImportError:
+    orjson = None
 
 # --- Paths (project-root aware) ---
 ROOT        = Path(__file__).resolve().parents[1]
@@ -34,22 +41,82 @@ README_PATH = ROOT / "README_production_notes.md"
 CHAP_RE     = re.compile(r"^(?P<prefix>\d{2})_chapter(?P<num>\d+)_master\.json$", re.IGNORECASE)
 REQUIRED    = {"index","scene","speaker","line","emotion","sfx","timing","notes"}
 
+@lru_cache(maxsize=4096)
+def _esc(s: str) -> str:
+    """html.escape, memoized: timings ("300ms", "500ms", …) and speaker names repeat constantly."""
+    return html.escape(s)
+
+WRITE_STATS = {"written": 0, "unchanged": 0}
+
+def write_if_changed(path: Path, content) -> bool:
+    """
+    Write str (as UTF-8) or already-encoded bytes, with the same newline
+    translation as write_text, unless the file already holds exactly those
+    bytes, so unchanged outputs keep their mtime.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    data = content if os.linesep == "\n" else content.replace(b"\n", os.linesep.encode("ascii"))
+    try:
+        if path.read_bytes() == data:
+            WRITE_STATS["unchanged"] += 1
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+    WRITE_STATS["written"] += 1
+    return True
+
+# Deletes every ASCII char that isn't a letter, digit, space, '-' or '_'
+_KEEP_ASCII = set(string.ascii_letters + string.digits + " -_")
+_DEL_TABLE  = str.maketrans("", "", "".join(chr(c) for c in range(0x80) if chr(c) not in _KEEP_ASCII))
+
+@lru_cache(maxsize=256)
 def safe_speaker_name(name: str) -> str:
-    safe = "".join(c for c in name if c.isalnum() or c in (" ","-","_")).strip()
-    return safe.replace(" ", "_") or "Unknown"
+    safe = name.translate(_DEL_TABLE)
+    if not safe.isascii():  # rare: keep Unicode letters/digits, drop other non-ASCII
+        safe = "".join(c for c in safe if c.isalnum() or c in (" ","-","_"))
+    return safe.strip().replace(" ", "_") or "Unknown"
+
+def load_json(path: Path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())  # parses UTF-8 bytes directly, no decode step
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def dump_json(obj) -> bytes:
+    """UTF-8 JSON with 2-space indent; orjson and json.dumps produce the same bytes here."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
 
 def load_chapters():
     if not SCRIPT_DIR.exists():
         print(f"ERROR: script directory not found: {SCRIPT_DIR}", file=sys.stderr)
         sys.exit(1)
     chapters = []
-    for p in SCRIPT_DIR.iterdir():
-        if p.is_file():
-            m = CHAP_RE.match(p.name)
-            if m:
-                chapters.append((p, m.group("prefix"), m.group("num")))
+    # scandir's DirEntry answers is_file() from the directory read, no per-entry stat
+    with os.scandir(SCRIPT_DIR) as it:
+        for e in it:
+            if e.is_file():
+                m = CHAP_RE.match(e.name)
+                if m:
+                    chapters.append((Path(e.path), m.group("prefix"), m.group("num")))
     chapters.sort(key=lambda t: t[1])  # by leading NN prefix
-    return chapters
+
+    # Read + parse + validate each chapter once; every rebuild step reuses `data`.
+    # Reads are I/O-bound, so overlap them (helps most on NTFS / network shares).
+    datas = []
+    if chapters:
+        with ThreadPoolExecutor(max_workers=min(8, len(chapters))) as ex:
+            datas = list(ex.map(load_json, [t[0] for t in chapters]))
+
+    loaded = []
+    for (path, prefix, num), data in zip(chapters, datas):
+        if not isinstance(data, list):
+            raise ValueError(f"{path.name}: expected top-level JSON array")
+        ensure_rows(data, path.name)
+        loaded.append((path, prefix, num, data))
+    return loaded
 
 def ensure_rows(rows, src_name):
     for row in rows:
@@ -59,11 +126,7 @@ def ensure_rows(rows, src_name):
 
 def rebuild_cast(chapters):
     speakers = set()
-    for path, _prefix, _num in chapters:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        if not isinstance(data, list):
-            raise ValueError(f"{path.name}: expected top-level JSON array")
-        ensure_rows(data, path.name)
+    for path, _prefix, _num, data in chapters:
         for r in data:
             sp = (r.get("speaker") or "").strip()
             if sp:
@@ -71,63 +134,64 @@ def rebuild_cast(chapters):
 
     old = []
     if CAST_PATH.exists():
-        try: old = json.loads(CAST_PATH.read_text(encoding="utf-8"))
+        try: old = load_json(CAST_PATH)
         except Exception: old = []
     voice_map = {c.get("name"): c.get("voice_note") for c in old if isinstance(c, dict)}
 
     merged = [{"name": name, "voice_note": voice_map.get(name, "")}
               for name in sorted(speakers, key=lambda s: s.lower())]
-    CAST_PATH.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_if_changed(CAST_PATH, dump_json(merged))
     return len(merged)
 
 def rebuild_sfx(chapters):
     lines = []
-    for path, _prefix, _num in chapters:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        ensure_rows(data, path.name)
+    for path, _prefix, _num, data in chapters:
         bucket = [f"{r['index']}. {r['scene']} — {r['sfx'].strip()}"
                   for r in data if (r.get("sfx") or "").strip()]
         if bucket:
             lines.append(f"=== {path.stem.replace('_master','')} ===")
             lines.extend(bucket)
             lines.append("")
-    SFX_PATH.write_text("\n".join(lines).rstrip() + ("\n" if lines else ""), encoding="utf-8")
+    write_if_changed(SFX_PATH, "\n".join(lines).rstrip() + ("\n" if lines else ""))
     return sum(1 for _ in lines if _ and not _.startswith("==="))
 
 def rebuild_scene_index(chapters):
     out = []
-    for path, prefix, _num in chapters:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        ensure_rows(data, path.name)
-
-        seen = set()
-        beats = []
+    for path, prefix, _num, data in chapters:
+        # One pass: first line and first Narrator line per scene (dicts keep scene order)
+        first_by_scene = {}
+        narr_by_scene = {}
         for r in data:
             sc = r["scene"]
-            if sc not in seen:
-                seen.add(sc)
-                narr = next((x for x in data if x["scene"] == sc and (x["speaker"] or "").lower() == "narrator"), None)
-                beat = narr["line"] if narr else r["line"]
-                if len(beat) > 140:
-                    beat = beat[:137].rstrip() + "…"
-                beats.append((sc, beat))
+            first_by_scene.setdefault(sc, r["line"])
+            if (r["speaker"] or "").lower() == "narrator":
+                narr_by_scene.setdefault(sc, r["line"])
+
+        beats = []
+        for sc, first_line in first_by_scene.items():
+            beat = narr_by_scene[sc] if sc in narr_by_scene else first_line
+            if len(beat) > 140:
+                beat = beat[:137].rstrip() + "…"
+            beats.append((sc, beat))
 
         if beats:
             out.append(f"=== {path.stem.replace('_master','')} ===")
             for sc, beat in beats:
                 out.append(f"{sc} — {beat}")
             out.append("")
-    SCENE_IDX.write_text("\n".join(out).rstrip() + ("\n" if out else ""), encoding="utf-8")
+    write_if_changed(SCENE_IDX, "\n".join(out).rstrip() + ("\n" if out else ""))
     return len(out)
 
 def export_per_speaker(chapters):
     VOICES_DIR.mkdir(parents=True, exist_ok=True)
-    agg = {}  # safe_speaker -> {"display": original, "items": [(prefix, chapter_stem, index, line, timing)]}
+    agg = {}  # safe_speaker -> {"display": original, "items": [(prefix, chapter_stem, index, line, esc_line, esc_timing)]}
+
+    # Create each speaker folder once up front instead of once per chapter
+    for safe in {safe_speaker_name(r["speaker"]) for _path, _prefix, _num, data in chapters for r in data}:
+        (VOICES_DIR / safe).mkdir(parents=True, exist_ok=True)
 
-    for path, prefix, _num in chapters:
+    for path, prefix, _num, data in chapters:
         chapter_stem = path.stem.replace("_master", "")  # e.g., 01_chapter1
-        data = json.loads(path.read_text(encoding="utf-8"))
-        ensure_rows(data, path.name)
 
         by_speaker = {}
         for r in data:
@@ -136,29 +200,27 @@ def export_per_speaker(chapters):
         for speaker, rows in by_speaker.items():
             safe = safe_speaker_name(speaker)
             speaker_dir = VOICES_DIR / safe
-            speaker_dir.mkdir(parents=True, exist_ok=True)
 
             txt_path  = speaker_dir / f"{chapter_stem}.txt"
             ssml_path = speaker_dir / f"{chapter_stem}.ssml"
 
-            with txt_path.open("w", encoding="utf-8") as f:
-                for r in sorted(rows, key=lambda x: int(x["index"])):
-                    f.write(f"{r['line']}\n")
-
-            with ssml_path.open("w", encoding="utf-8") as f:
-                f.write("<speak>\n")
-                f.write(f'  <voice name="{html.escape(speaker)}">\n')
-                for r in sorted(rows, key=lambda x: int(x["index"])):
-                    line = html.escape(str(r["line"]))
-                    f.write(f'    <prosody rate="medium">{line}</prosody>\n')
-                    timing = r.get("timing")
-                    if timing:
-                        f.write(f'    <break time="{html.escape(str(timing))}"/>\n')
-                f.write("  </voice>\n</speak>\n")
+            # Sort once, assemble each file in memory, write it in one call
+            rows_sorted = sorted(rows, key=lambda x: int(x["index"]))
+            write_if_changed(txt_path, "".join(f"{r['line']}\n" for r in rows_sorted))
 
+            # Escape each line/timing once; the _ALL.ssml pass reuses these strings
             bucket = agg.setdefault(safe, {"display": speaker, "items": []})
-            for r in rows:
-                bucket["items"].append((prefix, chapter_stem, int(r["index"]), str(r["line"]), str(r.get("timing") or "")))
+            parts = ["<speak>\n", f'  <voice name="{_esc(speaker)}">\n']
+            for r in rows_sorted:
+                line = str(r["line"])
+                esc_line = _esc(line)
+                esc_timing = _esc(str(r.get("timing") or ""))
+                parts.append(f'    <prosody rate="medium">{esc_line}</prosody>\n')
+                if esc_timing:
+                    parts.append(f'    <break time="{esc_timing}"/>\n')
+                bucket["items"].append((prefix, chapter_stem, int(r["index"]), line, esc_line, esc_timing))
+            parts.append("  </voice>\n</speak>\n")
+            write_if_changed(ssml_path, "".join(parts))
 
     for safe, payload in agg.items():
         speaker_display = payload["display"]
@@ -167,27 +229,27 @@ def export_per_speaker(chapters):
         all_txt  = speaker_dir / "_ALL.txt"
         all_ssml = speaker_dir / "_ALL.ssml"
 
-        with all_txt.open("w", encoding="utf-8") as f:
-            last_prefix = None
-            for prefix, chapter_stem, idx, line, timing in items:
-                if prefix != last_prefix:
-                    f.write(f"\n=== {chapter_stem} ===\n")
-                    last_prefix = prefix
-                f.write(f"{line}\n")
-
-        with all_ssml.open("w", encoding="utf-8") as f:
-            f.write("<speak>\n")
-            f.write(f'  <voice name="{html.escape(speaker_display)}">\n')
-            last_prefix = None
-            for prefix, chapter_stem, idx, line, timing in items:
-                if prefix != last_prefix:
-                    if last_prefix is not None:
-                        f.write('    <break time="300ms"/>\n')
-                    last_prefix = prefix
-                f.write(f'    <prosody rate="medium">{html.escape(line)}</prosody>\n')
-                if timing:
-                    f.write(f'    <break time="{html.escape(str(timing))}"/>\n')
-            f.write("  </voice>\n</speak>\n")
+        txt_parts = []
+        last_prefix = None
+        for prefix, chapter_stem, idx, line, _esc_line, _esc_timing in items:
+            if prefix != last_prefix:
+                txt_parts.append(f"\n=== {chapter_stem} ===\n")
+                last_prefix = prefix
+            txt_parts.append(f"{line}\n")
+        write_if_changed(all_txt, "".join(txt_parts))
+
+        ssml_parts = ["<speak>\n", f'  <voice name="{_esc(speaker_display)}">\n']
+        last_prefix = None
+        for prefix, _chapter_stem, _idx, _line, esc_line, esc_timing in items:
+            if prefix != last_prefix:
+                if last_prefix is not None:
+                    ssml_parts.append('    <break time="300ms"/>\n')
+                last_prefix = prefix
+            ssml_parts.append(f'    <prosody rate="medium">{esc_line}</prosody>\n')
+            if esc_timing:
+                ssml_parts.append(f'    <break time="{esc_timing}"/>\n')
+        ssml_parts.append("  </voice>\n</speak>\n")
+        write_if_changed(all_ssml, "".join(ssml_parts))
 
 def _readme_insert_or_replace_block(text: str, header: str, block: str) -> str:
     """Insert or replace a markdown section starting with a specific header line."""
@@ -207,12 +269,10 @@ def _readme_insert_or_replace_block(text: str, header: str, block: str) -> str:
 def update_readme_progress(chapters):
     # Build rows based on chapter files: derive human title from filename part after 'chapter'
     rows = []
-    for path, prefix, num in chapters:
+    for path, prefix, num, data in chapters:
         # filename example: 05_chapter5_master.json  -> title "Chapter 5"
         # You may choose to store richer titles in the JSON; for now, use a simple heuristic.
         title = f"Ch{int(num)}: "  # we’ll try to read first scene to seed a short label
-        data = json.loads(path.read_text(encoding="utf-8"))
-        ensure_rows(data, path.name)
         # Try to derive a short label from first Narrator line or first line
         first_scene = data[0].get("scene", "")
         # Friendly label from scene; fallback to 'Chapter <num>'
@@ -245,7 +305,7 @@ def update_readme_progress(chapters):
     # Read existing README (create if missing)
     text = README_PATH.read_text(encoding="utf-8") if README_PATH.exists() else "# My_Audiobook_Project – Production Notes\n"
     updated = _readme_insert_or_replace_block(text, "## 📊 Chapter Progress Tracker", "\n" + "\n".join(table_lines[1:]) + "\n")
-    README_PATH.write_text(updated, encoding="utf-8")
+    write_if_changed(README_PATH, updated)
 
 def main():
     chapters = load_chapters()
@@ -264,6 +324,7 @@ def main():
     print(f"Rebuilt scene_index.txt  — {scene_lines} lines (incl. headers)")
     print(f"Exported per-speaker files in {VOICES_DIR} (per-chapter + aggregates)")
     print(f"Updated README progress tracker with {len(chapters)} chapter(s)")
+    print(f"Wrote {WRITE_STATS['written']} file(s), {WRITE_STATS['unchanged']} already up to date")
 
 if __name__ == "__main__":
     main()